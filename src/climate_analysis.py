@@ -8,11 +8,14 @@ Last Updated: [Date]
 """
 
 import os
-from data_loader import load_netcdf, detect_time_format
-from trend_analysis import compute_linear_trend, convert_time_to_numeric
-from plotting import plot_trend_with_region, save_figure
+import logging
+import matplotlib
+matplotlib.use("Agg")  # ✅ Headless raster backend; figures are only written to disk
+from data_loader import load_netcdf, load_scenarios, decode_variable, detect_time_format
+from trend_analysis import compute_linear_trend, convert_time_to_numeric, prepare_design
+from plotting import plot_trend_with_region, save_figure, wait_for_saves
 
-print("🚀 climate_analysis.py is running!")
+log = logging.getLogger(__name__)
 
 # ====== CONFIGURATION ======
 DATA_DIR = "data"  
@@ -21,42 +24,56 @@ SAVE_DIR = "output_figures"
 
 # ====== MAIN EXECUTION ======
 if __name__ == "__main__":
-    print("🚀 Starting climate analysis script!")
-
-    for dataset_name in SCENARIOS:
-        file_path = os.path.join(DATA_DIR, f"{dataset_name}.nc")
-        print(f"📂 Checking file: {file_path}")
-
-        dataset = load_netcdf(file_path)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    log.debug("🚀 Starting climate analysis script!")
+
+    # Open every scenario in one pass; dask overlaps their chunk reads
+    file_paths = [os.path.join(DATA_DIR, f"{name}.nc") for name in SCENARIOS]
+    log.debug(f"📂 Checking files: {file_paths}")
+    scenarios = load_scenarios(file_paths, SCENARIOS)
+    if scenarios is None:
+        log.warning("⚠️ Falling back to loading scenario files one at a time")
+
+    for i, dataset_name in enumerate(SCENARIOS):
+        # ✅ Per-file fallback: a missing or bad file only skips its own scenario
+        dataset = scenarios.isel(scenario=i) if scenarios is not None else load_netcdf(file_paths[i])
         if dataset:
-            print(f"✅ Dataset loaded: {dataset_name}")
+            log.info(f"✅ Dataset loaded: {dataset_name}")
 
             # Select first available variable
-            variable_name = list(dataset.data_vars.keys())[0]
-            print(f"📊 Using variable: {variable_name}")
+            variable_name = next(iter(dataset.data_vars))
+            log.debug(f"📊 Using variable: {variable_name}")
+
+            # Decode only the selected variable and time
+            dataset = decode_variable(dataset, variable_name)
 
             # Get variable units
             var_units = dataset[variable_name].attrs.get("units", "Unknown")
-            print(f"📏 Variable Units: {var_units}")
+            log.debug(f"📏 Variable Units: {var_units}")
 
             # Convert time
             numeric_time = convert_time_to_numeric(dataset)
+            design = None
             if numeric_time is not None:
+                design = prepare_design(numeric_time)  # ✅ Shared by every variable on this time axis
+                dataset = dataset.assign_coords(numeric_time=("time", numeric_time))  # ✅ Cache for trend computation
                 start_year, end_year = numeric_time[0], numeric_time[-1]
-                print(f"📆 Time Range: {start_year:.2f} - {end_year:.2f}")
+                log.debug(f"📆 Time Range: {start_year:.2f} - {end_year:.2f}")
 
             # Compute trend
-            trend_map, p_value_map = compute_linear_trend(dataset, variable_name)
-            if trend_map is None:
-                print(f"❌ ERROR: Trend computation failed for {variable_name}!")
+            trend = compute_linear_trend(dataset, variable_name, design=design)
+            if trend is None:
+                log.error(f"❌ ERROR: Trend computation failed for {variable_name}!")
+                trend_map = None
             else:
-                print(f"✅ Trend computed for {variable_name}")
+                log.info(f"✅ Trend computed for {variable_name}")
+                trend_map = trend["slope"]
 
             # Detect time format
             time_info = detect_time_format(dataset)
 
             # Plot trend
-            print(f"🖼️ Plotting trend for {variable_name}...")
+            log.debug(f"🖼️ Plotting trend for {variable_name}...")
             fig_trend = plot_trend_with_region(
                 trend=trend_map,
                 var_name=variable_name,
@@ -68,9 +85,11 @@ if __name__ == "__main__":
 
             # Save figure
             if fig_trend:
-                print("📁 Saving figure...")
-                save_figure(fig_trend, variable_name, dataset_name, "trend", "png")
-                print("✅ Figure saved successfully!")
+                log.debug("📁 Queuing figure save...")
+                save_figure(fig_trend, variable_name, dataset_name, "trend", "png", dpi=300, save_dir=SAVE_DIR)
             else:
-                print("❌ No figure to save!")
+                log.error("❌ No figure to save!")
+
+    # Make sure background figure saves have finished
+    wait_for_saves()
 
@@ -1,39 +1,157 @@
+import os
+import json
+import shutil
+import logging
 import xarray as xr
 import numpy as np
-import cftime
 
-def load_netcdf(file_path: str):
-    """Load a NetCDF dataset using xarray."""
+log = logging.getLogger(__name__)
+
+# ✅ Keep each time series in one chunk (needed for regression) and tile lat/lon for dask
+CHUNKS = {"time": -1, "lat": "auto", "lon": "auto"}
+
+# ✅ Source stamp lives in its own file inside the store, so it never shows up in the dataset's attrs
+STAMP_FILE = "source_stamp.json"
+
+def _source_stamp(file_path: str):
+    """Modification time and size of a source file, recorded next to its Zarr copy to detect updates."""
+    stat = os.stat(file_path)
+    return {"source_mtime": stat.st_mtime, "source_size": stat.st_size}
+
+def _ensure_zarr(file_path: str):
+    """Write a sibling `.zarr` copy of a NetCDF file on first use (or after it changes) and return its path.
+
+    The store is chunked like `CHUNKS` (full time series, spatial tiles), the layout it is read in,
+    so opening it with `chunks={}` maps each dask task to exactly one stored chunk.
+    """
+    zarr_path = f"{file_path}.zarr"
+    if os.path.isdir(zarr_path):
+        if not os.path.exists(file_path):
+            log.warning(f"⚠️ {file_path} not found; using cached {zarr_path}")
+            return zarr_path
+        try:
+            with open(os.path.join(zarr_path, STAMP_FILE)) as f:
+                cached_stamp = json.load(f)
+        except (OSError, ValueError):
+            cached_stamp = None
+        if cached_stamp == _source_stamp(file_path):
+            return zarr_path
+        log.info(f"⏳ {file_path} changed since it was cached; rebuilding Zarr store...")
+    else:
+        log.info(f"⏳ Converting {file_path} to Zarr (first load only)...")
+
+    tmp_path = f"{zarr_path}.tmp"
+    stamp = _source_stamp(file_path)
+    with xr.open_dataset(file_path, decode_cf=False) as ds:
+        for var in ds.variables.values():
+            var.encoding.clear()  # ✅ Drop NetCDF chunk/compression settings so CHUNKS apply
+        chunks = {dim: size for dim, size in CHUNKS.items() if dim in ds.dims}
+        ds.chunk(chunks).to_zarr(tmp_path, mode="w", consolidated=True)
+    with open(os.path.join(tmp_path, STAMP_FILE), "w") as f:
+        json.dump(stamp, f)
+    if os.path.isdir(zarr_path):
+        shutil.rmtree(zarr_path)
+    os.replace(tmp_path, zarr_path)  # ✅ Only expose the store once it is complete
+    log.info(f"✅ Zarr store written: {zarr_path}")
+    return zarr_path
+
+def load_netcdf(file_path: str, use_zarr: bool = True):
+    """Load a NetCDF dataset using xarray, lazily chunked along the spatial dimensions.
+
+    With `use_zarr`, the file is converted to a sibling Zarr store on first load and
+    read from that store on every later run. Variables are returned undecoded; use
+    `decode_variable` to CF-decode only the variable being analyzed.
+    """
+    try:
+        if use_zarr:
+            ds = xr.open_zarr(_ensure_zarr(file_path), consolidated=True, chunks={}, decode_cf=False)
+        else:
+            ds = xr.open_dataset(file_path, chunks=CHUNKS, decode_cf=False)
+        log.debug(f"✅ Successfully loaded dataset: {file_path}")
+        # ✅ Lazy %-formatting: the attribute dump is only rendered when DEBUG is on
+        log.debug("📊 Available variables: %s", list(ds.data_vars))
+        log.debug("📏 Dataset Dimensions: %s", ds.dims)
+        log.debug("📊 Dataset Attributes: %s", ds.attrs)
+
+        return ds
+    except Exception as e:
+        log.error(f"❌ Error loading file: {e}")
+        return None
+
+def _time_encoding(ds):
+    """Raw `(units, calendar)` of an undecoded dataset's time axis."""
+    time_attrs = ds["time"].attrs if "time" in ds else {}
+    return time_attrs.get("units"), time_attrs.get("calendar", "standard")
+
+def _require_matching_scenario(expected_vars, expected_time):
+    """`open_mfdataset` preprocess hook rejecting files whose variables or raw time units/calendar differ.
+
+    Nested concatenation would otherwise merge differing variables and pad the gaps with NaN.
+    """
+    def check(ds):
+        found_vars = sorted(ds.data_vars)
+        if found_vars != expected_vars:
+            raise ValueError(f"variables {found_vars} differ from {expected_vars}; scenarios would be NaN-padded")
+        found_time = _time_encoding(ds)
+        if found_time != expected_time:
+            raise ValueError(f"time units/calendar {found_time} differ from {expected_time}; scenarios would be misaligned")
+        return ds
+    return check
+
+def load_scenarios(file_paths, scenario_names, use_zarr: bool = True):
+    """Open several scenario files as one lazily chunked dataset stacked along a new `scenario` dimension.
+
+    All files must hold the same variables on the same grid and time axis (same raw offsets,
+    units and calendar); anything else is rejected rather than padded with NaN. A single
+    metadata scan and `parallel=True` let dask overlap chunk reads across scenarios; select
+    one with `.isel(scenario=i)`. With `use_zarr`, the cached Zarr stores are read instead.
+    Returns None if any file is missing, unreadable or mismatched, so callers can fall
+    back to `load_netcdf` per file.
+    """
     try:
-        ds = xr.open_dataset(file_path)
-        print(f"✅ Successfully loaded dataset: {file_path}")
-        print(f"📊 Available variables: {list(ds.data_vars.keys())}\n")
-        print(f"📏 Dataset Dimensions: {ds.dims}")
-        print(f"📊 Dataset Attributes: {ds.attrs}\n")
+        if use_zarr:
+            paths = [_ensure_zarr(file_path) for file_path in file_paths]
+            # ✅ Stores are already chunked like CHUNKS; chunks={} keeps one task per stored chunk
+            backend_kwargs = {"engine": "zarr", "consolidated": True, "chunks": {}}
+        else:
+            paths, backend_kwargs = list(file_paths), {"chunks": CHUNKS}
 
+        # ✅ Times stay raw (decode_cf=False), so equal offsets only mean equal dates if units/calendar match
+        with xr.open_dataset(paths[0], decode_cf=False, **backend_kwargs) as first:
+            expected_vars, expected_time = sorted(first.data_vars), _time_encoding(first)
+        ds = xr.open_mfdataset(paths, concat_dim="scenario", combine="nested", join="exact",
+                               preprocess=_require_matching_scenario(expected_vars, expected_time),
+                               parallel=True, decode_cf=False, **backend_kwargs)
+        ds = ds.assign_coords(scenario=list(scenario_names))
+        log.debug("📊 Loaded scenarios: %s", list(scenario_names))
         return ds
     except Exception as e:
-        print(f"❌ Error loading file: {e}\n")
+        log.error(f"❌ Error loading scenario files: {e}")
         return None
 
+def decode_variable(ds, var_name: str):
+    """CF-decode (times, masks, scales) only `var_name` and the time axis of a raw dataset."""
+    return xr.decode_cf(ds[[var_name, "time"]])
+
 def detect_time_format(ds):
     """Detect and log the time dimension format in a dataset."""
     if "time" not in ds:
-        print("⚠️ No time dimension found in dataset!\n")
+        log.warning("⚠️ No time dimension found in dataset!")
         return None
 
     time_dim = ds["time"]
-    time_units = time_dim.attrs.get("units", "Unknown")
+    time_units = time_dim.encoding.get("units", time_dim.attrs.get("units", "Unknown"))  # ✅ Decoded times keep units in encoding
 
-    # ✅ Fix: Convert CFTime to NumPy datetime before extracting min/max
+    # ✅ Take min/max first, then convert only those two CFTime values to NumPy datetime
     time_values = time_dim.values
-    if isinstance(time_values[0], cftime.datetime):
-        print("⏳ Converting CFTime to NumPy datetime format...")
-        time_values = np.array([np.datetime64(t.isoformat()) for t in time_values])  # Convert to NumPy datetime64
+    time_min, time_max = time_values.min(), time_values.max()
+    if time_dim.dtype == object:  # ✅ Decoded CFTime axes are object arrays; no element access needed
+        log.debug("⏳ Converting CFTime to NumPy datetime format...")
+        time_min, time_max = np.datetime64(time_min.isoformat()), np.datetime64(time_max.isoformat())
 
-    time_start = np.datetime_as_string(time_values.min(), unit="D")
-    time_end = np.datetime_as_string(time_values.max(), unit="D")
+    time_start = np.datetime_as_string(time_min, unit="D")
+    time_end = np.datetime_as_string(time_max, unit="D")
 
-    print(f"📆 Time detected: {time_start} to {time_end} ({time_units})\n")
+    log.debug(f"📆 Time detected: {time_start} to {time_end} ({time_units})")
     return time_start, time_end, time_units
 
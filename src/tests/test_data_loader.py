@@ -0,0 +1,79 @@
+"""Scenario loading checks: matching files stack, mismatched files are rejected."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import xarray as xr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+
+
+def _write_scenario(path, var_name="PRECT", units="days since 0850-01-01", calendar="noleap"):
+    time = np.arange(24) * 30.0
+    ds = xr.Dataset(
+        {var_name: (("time", "lat", "lon"), np.random.rand(24, 4, 6).astype("f4"))},
+        coords={
+            "time": ("time", time, {"units": units, "calendar": calendar}),
+            "lat": np.linspace(-60, 60, 4),
+            "lon": np.arange(0, 360, 60.0),
+        },
+    )
+    ds.to_netcdf(path, engine="scipy")
+    return str(path)
+
+
+@pytest.fixture(params=[False, True], ids=["netcdf", "zarr"])
+def use_zarr(request):
+    if request.param:
+        pytest.importorskip("zarr")
+    return request.param
+
+
+def test_matching_scenarios_stack(tmp_path, use_zarr):
+    paths = [_write_scenario(tmp_path / "a.nc"), _write_scenario(tmp_path / "b.nc")]
+    ds = data_loader.load_scenarios(paths, ["a", "b"], use_zarr=use_zarr)
+
+    assert ds is not None
+    assert list(ds.scenario.values) == ["a", "b"]
+    assert list(ds.data_vars) == ["PRECT"]
+    assert not np.isnan(ds["PRECT"].values).any()
+
+
+def test_different_variables_are_rejected(tmp_path, use_zarr):
+    paths = [_write_scenario(tmp_path / "prect.nc", "PRECT"), _write_scenario(tmp_path / "ts.nc", "TS")]
+    assert data_loader.load_scenarios(paths, ["prect", "ts"], use_zarr=use_zarr) is None
+
+    # The per-file fallback still sees each scenario's own variable
+    ts = data_loader.load_netcdf(paths[1], use_zarr=use_zarr)
+    assert next(iter(ts.data_vars)) == "TS"
+
+
+@pytest.mark.parametrize("units, calendar", [
+    ("days since 1850-01-01", "noleap"),
+    ("days since 0850-01-01", "standard"),
+])
+def test_different_time_encoding_is_rejected(tmp_path, use_zarr, units, calendar):
+    paths = [_write_scenario(tmp_path / "a.nc"), _write_scenario(tmp_path / "b.nc", units=units, calendar=calendar)]
+    assert data_loader.load_scenarios(paths, ["a", "b"], use_zarr=use_zarr) is None
+
+
+def test_missing_file_returns_none(tmp_path, use_zarr):
+    paths = [_write_scenario(tmp_path / "a.nc"), str(tmp_path / "missing.nc")]
+    assert data_loader.load_scenarios(paths, ["a", "missing"], use_zarr=use_zarr) is None
+
+
+def test_zarr_cache_keeps_source_attrs_and_rebuilds_on_change(tmp_path):
+    pytest.importorskip("zarr")
+    path = _write_scenario(tmp_path / "a.nc")
+    ds = data_loader.load_netcdf(path)
+    assert dict(ds.attrs) == dict(data_loader.load_netcdf(path, use_zarr=False).attrs)
+
+    # Rewriting the source (new size and mtime) invalidates the cached store
+    _write_scenario(tmp_path / "a.nc", "TS")
+    os.utime(path, (0, 0))
+    assert list(data_loader.load_netcdf(path).data_vars) == ["TS"]
+    assert not os.path.exists(f"{path}.zarr.tmp")
@@ -0,0 +1,76 @@
+"""Fast imshow path checks: extent, reordering and the pcolormesh fallbacks."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cartopy")
+import matplotlib  # noqa: E402
+
+matplotlib.use("Agg")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plotting  # noqa: E402
+
+
+def _assert_pixels_in_source_cells(lon, lat):
+    """Every image pixel centre must fall inside the grid cell its value came from."""
+    dlon, dlat = abs(lon[1] - lon[0]), abs(lat[1] - lat[0])
+    lon2d, lat2d = np.meshgrid(lon, lat)
+    lon_image, extent = plotting._regular_grid_image(lon, lat, lon2d)
+    lat_image, _ = plotting._regular_grid_image(lon, lat, lat2d)
+    assert lon_image.shape == lat_image.shape
+
+    rows, cols = lon_image.shape
+    x = extent[0] + (np.arange(cols) + 0.5) * (extent[1] - extent[0]) / cols
+    y = extent[2] + (np.arange(rows) + 0.5) * (extent[3] - extent[2]) / rows
+    lon_offset = (lon_image - x[None, :] + 180) % 360 - 180
+    assert (np.abs(lon_offset) <= dlon / 2 + 1e-9).all()
+    assert (np.abs(lat_image - y[:, None]) <= dlat / 2 + 1e-9).all()
+    return lon_image, extent
+
+
+def test_half_cell_offset_grid():
+    lon, lat = np.arange(0.5, 360), np.arange(-89.5, 90)
+    image, extent = _assert_pixels_in_source_cells(lon, lat)
+    np.testing.assert_allclose(extent, [-180, 180, -90, 90])
+    assert image.shape == (180, 360)
+
+
+def test_dateline_and_pole_centred_grid():
+    # CESM f19: cells centred on 0/180 longitude and on both poles
+    lon, lat = np.arange(0, 360, 2.5), np.linspace(-90, 90, 96)
+    image, extent = _assert_pixels_in_source_cells(lon, lat)
+    assert extent == [-180.0, 180.0, -90.0, 90.0]
+    assert image.shape == (2 * 96 - 2, 2 * 144)
+
+
+def test_descending_lat_and_signed_lon_are_reordered():
+    lon, lat = np.arange(-179.5, 180), np.arange(89.5, -90, -1.0)
+    image, extent = _assert_pixels_in_source_cells(lon, lat)
+    np.testing.assert_allclose(extent, [-180, 180, -90, 90])
+
+
+def test_identity_order_returns_input():
+    lon, lat = np.arange(-179.5, 180), np.arange(-89.5, 90)
+    values = np.zeros((lat.size, lon.size))
+    image, _ = plotting._regular_grid_image(lon, lat, values)
+    assert image is values
+
+
+@pytest.mark.parametrize("lon, lat", [
+    (np.arange(0.5, 360), np.array([-60.0, -30.0, 0.0, 45.0])),     # uneven latitudes
+    (np.arange(0.5, 360), np.arange(-88.5, 90, 2.0)),                # edges past the north pole
+    (np.arange(-180, -100, 2.5), np.arange(-29.5, 30)),              # regional grid across the dateline
+    (np.array([0.5]), np.arange(-89.5, 90)),                         # single column
+])
+def test_irregular_or_out_of_bounds_grids_fall_back(lon, lat):
+    assert plotting._regular_grid_image(lon, lat, np.zeros((lat.size, lon.size))) is None
+
+
+def test_2d_coordinates_fall_back():
+    lon2d, lat2d = np.meshgrid(np.arange(0.5, 360), np.arange(-89.5, 90))
+    assert plotting._regular_grid_image(lon2d, lat2d, np.zeros(lon2d.shape)) is None
@@ -0,0 +1,80 @@
+"""Regression kernel checks against scipy.stats.linregress."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trend_analysis  # noqa: E402
+
+# 850-2005 monthly, the CESM-LME time axis
+TIME = np.arange(850, 2006, 1 / 12.0)
+CONSTANTS = [1.0, 100.0, 0.3]
+
+
+def _rows():
+    rng = np.random.default_rng(0)
+    random_rows = rng.normal(size=(5, TIME.size)) + 0.01 * TIME
+    nan_row = random_rows[0].copy()
+    nan_row[10] = np.nan
+    constant_rows = np.array([np.full(TIME.size, c) for c in CONSTANTS])
+    return random_rows, nan_row, constant_rows
+
+
+@pytest.fixture(params=["numba-parallel", "numba-serial", "numpy"])
+def kernel(request, monkeypatch):
+    """The regression kernel under each backend."""
+    if request.param == "numpy":
+        monkeypatch.setattr(trend_analysis, "_fit", None)
+        parallel = True
+    elif trend_analysis._fit is None:
+        pytest.skip("numba not installed")
+    else:
+        parallel = request.param == "numba-parallel"
+    x, sxx = trend_analysis.prepare_design(TIME)
+    return lambda y: trend_analysis._linregress_kernel(y, x, sxx, parallel=parallel)
+
+
+def test_matches_linregress(kernel):
+    random_rows, nan_row, _ = _rows()
+    y = np.vstack([random_rows, nan_row])
+    slope, p_value = kernel(y)
+
+    expected = [linregress(TIME, row) for row in random_rows]
+    np.testing.assert_allclose(slope[:-1], [r.slope for r in expected], rtol=1e-5)
+    np.testing.assert_allclose(p_value[:-1], [r.pvalue for r in expected], rtol=1e-4, atol=1e-30)
+
+    # NaN anywhere in the series propagates, like linregress
+    assert np.isnan(slope[-1]) and np.isnan(p_value[-1])
+    assert np.isnan(linregress(TIME, nan_row).pvalue)
+
+
+def test_constant_rows_are_not_significant(kernel):
+    _, _, constant_rows = _rows()
+    slope, p_value = kernel(constant_rows)
+
+    np.testing.assert_array_equal(slope, 0.0)
+    assert np.isnan(p_value).all()
+    for row in constant_rows[:2]:
+        result = linregress(TIME, row)
+        assert result.slope == 0.0 and np.isnan(result.pvalue)
+
+
+def test_grid_shape_is_preserved(kernel):
+    random_rows, _, _ = _rows()
+    y = random_rows[:4].reshape(2, 2, TIME.size)
+    slope, p_value = kernel(y)
+    assert slope.shape == p_value.shape == (2, 2)
+    assert slope.dtype == p_value.dtype == np.float32
+
+
+def test_serial_build_releases_gil():
+    if trend_analysis._fit_serial is None:
+        pytest.skip("numba not installed")
+    assert trend_analysis._fit_serial.targetoptions["nogil"]
+    # Its own Python function, so its disk cache entry is not shared with the parallel build
+    assert trend_analysis._fit_serial.py_func is not trend_analysis._fit.py_func
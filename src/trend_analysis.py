@@ -12,28 +12,46 @@ Author: [Your Name]
 Last Updated: [Date]
 """
 
+import logging
 import numpy as np
-import cftime
 import xarray as xr
-from scipy.stats import linregress
+from scipy import stats
+
+try:
+    from numba import njit, prange
+except ImportError:  # ✅ Numba is optional; the NumPy kernel is used without it
+    njit = None
+
+log = logging.getLogger(__name__)
 
 def convert_time_to_numeric(ds):
     """Convert CESM CFTime objects to numeric years, correcting for 1-month offset."""
     if "time" not in ds:
-        print("❌ ERROR: No 'time' variable found in dataset!")
+        log.error("❌ ERROR: No 'time' variable found in dataset!")
         return None
 
     time_var = ds["time"]
-    
-    if isinstance(time_var.values[0], cftime.datetime):
-        print("⏳ Converting CFTime to numeric values (correcting CESM month shift)...")
-        numeric_time = np.array([t.year + (t.month) / 12 for t in time_var.values])  # ✅ Fix: No (-1) to keep months correct
+
+    # ✅ Branch on dtype only: "O" is CFTime, "M" is datetime64; no element (or chunk) access
+    if time_var.dtype.kind == "M":
+        values = time_var.values
+        years = values.astype("datetime64[Y]").astype(int) + 1970
+        months = values.astype("datetime64[M]").astype(int) % 12 + 1
+        return years + months / 12.0
+    elif time_var.dtype.kind == "O":
+        log.debug("⏳ Converting CFTime to numeric values (correcting CESM month shift)...")
+        try:
+            # ✅ Vectorized year/month extraction; no (-1) so months stay correct
+            numeric_time = time_var.dt.year.values + time_var.dt.month.values / 12.0
+        except (AttributeError, TypeError):
+            import cftime  # ✅ Imported lazily: only this fallback needs the C extension directly
+            numeric_time = cftime.date2num(time_var.values, units="days since 0001-01-01", calendar=time_var.values[0].calendar) / 365.25
         
         # ✅ Print Start, End Date, and Frequency
         start_year = numeric_time[0]
         end_year = numeric_time[-1]
         frequency = round((numeric_time[1] - numeric_time[0]) * 12)  # Convert to months
-        print(f"📆 Time Range: {start_year:.2f} - {end_year:.2f} ({frequency} months per step)")
+        log.debug(f"📆 Time Range: {start_year:.2f} - {end_year:.2f} ({frequency} months per step)")
         
         return numeric_time
     else:
@@ -42,53 +60,154 @@ def convert_time_to_numeric(ds):
 def compute_regional_timeseries(ds, var_name: str):
     """Compute a regional mean time series for climate data."""
     if var_name not in ds:
-        print(f"❌ ERROR: Variable {var_name} not found in dataset!")
+        log.error(f"❌ ERROR: Variable {var_name} not found in dataset!")
         return None
 
     regional_mean = ds[var_name].mean(dim=["lat", "lon"])
-    print(f"✅ Computed regional mean time series for {var_name} 🌍\n")
+    log.debug(f"✅ Computed regional mean time series for {var_name} 🌍")
     return regional_mean
 
-def compute_linear_trend(ds, var_name: str):
-    """Compute a linear trend and statistical significance."""
-    print(f"🔍 Computing trend for {var_name}...")
+def _fit_numpy(y2d, x, sxx):
+    """Slope and t-statistic for each row of `y2d` against centered `x` using array reductions."""
+    n = x.size
+    # ✅ Shift by the first value so constant rows are exactly zero (slope 0, t NaN, like linregress)
+    y2d = y2d - y2d[:, :1]
+    y_mean = y2d.mean(axis=1, keepdims=True)
+    slope = ((y2d - y_mean) * x).sum(axis=1) / sxx
+    resid = y2d - (slope[:, None] * x + y_mean)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_err = np.sqrt((resid * resid).sum(axis=1) / (n - 2) / sxx)
+        t_stat = slope / std_err
+    return slope, t_stat
+
+def _fit_rows(y2d, x, sxx, out_slope, out_t):
+    """Fused kernel: one streaming pass per grid point accumulating sums, then slope and t-statistic."""
+    n_points, n = y2d.shape
+    sx = 0.0
+    for i in range(n):
+        sx += x[i]
+    for j in prange(n_points):
+        # ✅ Accumulate on the series shifted by its first value: constant rows give exact zeros
+        y0 = y2d[j, 0]
+        sy = 0.0
+        syy = 0.0
+        sxy = 0.0
+        for i in range(n):
+            yi = y2d[j, i] - y0
+            sy += yi
+            syy += yi * yi
+            sxy += x[i] * yi
+        syy_c = syy - sy * sy / n
+        sxy_c = sxy - sx * sy / n  # ✅ `x` is centered, but its sum is only zero up to rounding
+        slope = sxy_c / sxx
+        out_slope[j] = slope
+        if syy_c <= 0.0:
+            out_t[j] = np.nan  # ✅ Constant series: no significance, matching linregress
+        else:
+            ss_res = max(syy_c - slope * sxy_c, 0.0)  # ✅ Clamp rounding noise on perfect fits
+            out_t[j] = slope / np.sqrt(ss_res / (n - 2) / sxx)
+
+def _fit_rows_serial(y2d, x, sxx, out_slope, out_t):
+    """Serial entry point for `_fit_rows`; a separate function so its build gets its own cache entry."""
+    _fit_rows_inner(y2d, x, sxx, out_slope, out_t)
+
+if njit is not None:
+    # ✅ Dask already runs chunks on its thread pool, so chunked data uses the serial build
+    #    (nesting Numba's pool inside dask threads aborts under the workqueue layer). It releases
+    #    the GIL so those chunks really run concurrently.
+    _fit = njit(parallel=True, fastmath={"reassoc", "contract"}, error_model="numpy", cache=True)(_fit_rows)
+    _fit_rows_inner = njit(fastmath={"reassoc", "contract"}, error_model="numpy", nogil=True)(_fit_rows)
+    _fit_serial = njit(nogil=True, cache=True)(_fit_rows_serial)
+else:
+    prange = range
+    _fit = _fit_serial = None
+
+def prepare_design(time_values):
+    """Centered time axis and its sum of squares `(x, sxx)`, shared by every variable on that axis."""
+    x = np.asarray(time_values, dtype=np.float64)
+    x = x - x.mean()
+    return x, (x * x).sum()
+
+def _linregress_kernel(y, x, sxx, parallel=True):
+    """Least-squares slope and two-sided p-value along the last axis of `y` for all grid points at once.
+
+    Sums are accumulated in float64 for stability; outputs are float32 for plotting and storage.
+    Pass `parallel=False` when the caller (e.g. dask) already runs kernels on multiple threads.
+    """
+    n = x.size
+
+    # ✅ One row per grid point, time contiguous
+    y2d = np.ascontiguousarray(y.reshape(-1, n), dtype=np.float64)
+    if _fit is not None:
+        slope = np.empty(y2d.shape[0])
+        t_stat = np.empty(y2d.shape[0])
+        (_fit if parallel else _fit_serial)(y2d, x, sxx, slope, t_stat)
+    else:
+        slope, t_stat = _fit_numpy(y2d, x, sxx)
+    p_value = 2 * stats.t.sf(np.abs(t_stat), n - 2)
+
+    out_shape = y.shape[:-1]
+    return (slope.reshape(out_shape).astype(np.float32, copy=False),
+            p_value.reshape(out_shape).astype(np.float32, copy=False))
+
+def compute_linear_trend(ds, var_name: str, time_values=None, design=None, ensemble=0):
+    """Compute a linear trend and statistical significance as a Dataset with `slope` and `pvalue`.
+
+    Pass `design` from `prepare_design` to reuse it across variables on the same time axis.
+    Otherwise `time_values` (numeric years) are taken from the argument, then from a cached
+    `numeric_time` coordinate, and only converted from `time` as a last resort.
+    Only ensemble member `ensemble` is fitted when the data has an `ensemble` dimension;
+    pass `ensemble=None` to fit every member.
+    """
+    log.debug(f"🔍 Computing trend for {var_name}...")
 
     if var_name not in ds:
-        print(f"❌ ERROR: Variable {var_name} not found in dataset!")
-        return None, None
+        log.error(f"❌ ERROR: Variable {var_name} not found in dataset!")
+        return None
 
     if "time" not in ds:
-        print(f"❌ ERROR: No 'time' dimension found in dataset!")
-        return None, None
+        log.error(f"❌ ERROR: No 'time' dimension found in dataset!")
+        return None
 
-    # ✅ Convert CFTime to numeric before using it
-    time_values = convert_time_to_numeric(ds)
-    if time_values is None:
-        print("❌ ERROR: Time conversion failed!")
-        return None, None
+    if design is None:
+        # ✅ Reuse numeric time when available; only convert CFTime if needed
+        if time_values is None and "numeric_time" in ds.coords:
+            time_values = ds.coords["numeric_time"].values
+        if time_values is None:
+            time_values = convert_time_to_numeric(ds)
+        if time_values is None:
+            log.error("❌ ERROR: Time conversion failed!")
+            return None
+        design = prepare_design(time_values)
+    x, sxx = design
 
     var_data = ds[var_name]
+    if ensemble is not None and "ensemble" in var_data.dims:
+        var_data = var_data.isel(ensemble=ensemble)  # ✅ Select before fitting, not after
+    if var_data.chunks is not None:
+        var_data = var_data.chunk({"time": -1})  # ✅ Regression needs the full time series per chunk
 
-    if len(time_values) < 2:
-        print(f"❌ ERROR: Not enough time points to compute trend!")
-        return None, None
-
-    def linreg(y):
-        """Helper function for computing linear regression for each grid point."""
-        slope, intercept, r_value, p_value, std_err = linregress(time_values, y)
-        return slope, p_value
+    if x.size < 2:
+        log.error(f"❌ ERROR: Not enough time points to compute trend!")
+        return None
 
+    # ✅ Closed-form fit rather than `polyfit(deg=1, cov=True)`: same slope, without a lstsq solve
+    #    and a covariance matrix per grid point, and it is dask-parallel through apply_ufunc
     try:
         slope, p_value = xr.apply_ufunc(
-            linreg, var_data,
+            _linregress_kernel, var_data,
             input_core_dims=[["time"]],
             output_core_dims=[[], []],
-            vectorize=True
+            kwargs={"x": x, "sxx": sxx, "parallel": var_data.chunks is None},
+            dask="parallelized",
+            output_dtypes=[np.float32, np.float32]
         )
-        print(f"📉 Trend computed successfully for {var_name}!")
+        # ✅ One Dataset so both outputs come from a single pass over the dask graph
+        trend = xr.Dataset({"slope": slope, "pvalue": p_value}).persist()
+        log.debug(f"📉 Trend computed successfully for {var_name}!")
     except Exception as e:
-        print(f"❌ Trend computation failed: {e}")
-        return None, None
-
-    return slope, p_value
+        log.error(f"❌ Trend computation failed: {e}")
+        return None
 
+    return trend